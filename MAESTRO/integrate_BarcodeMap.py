@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# @Author: Chenfei Wang
+# @E-mail: Dongqingsun96@gmail.com
+# @Date:   2021-06-10 10:22:16
+# @Last Modified by:   Chenfei Wang
+# @Last Modified time: 2021-06-10 10:22:16
+
+
+import os
+import argparse as ap
+
+# numpy/pandas/h5py and the H5Process helpers are imported inside the
+# functions that need them, so that building the subcommand parser (and any
+# other subcommand) does not pay their import cost
+
+
+def barcodemap_parser(subparsers):
+    """
+    Add main function multiome-barcodemap argument parsers.
+    """
+
+    workflow = subparsers.add_parser("multiome-barcodemap",
+        help = "Map cell barcodes between the scATAC-seq and scRNA-seq libraries of 10x multiome data, "
+        "and filter both count matrices down to the cells shared by the two assays.")
+    group_input = workflow.add_argument_group("Input files arguments")
+    group_input.add_argument("--rnacount", dest = "rnacount", default = "",
+        help = "Location of gene count matrix file in HDF5 format. "
+        "Gene count matrix with genes as rows and cells as columns.")
+    group_input.add_argument("--peakcount", dest = "peakcount", default = "",
+        help = "Location of peak count matrix file in HDF5 format. "
+        "Peak count matrix with peaks as rows and cells as columns "
+        "and row names should be like 'chromosome_peakstart_peakend', such as 'chr10_100020591_100020841'.")
+    group_input.add_argument("--atac-barcode-lib", dest = "atac_barcode_lib", default = "",
+        help = "Location of the scATAC-seq barcode library (for example, the Cell Ranger ARC ATAC barcode whitelist). "
+        "Each line is one valid ATAC barcode, in the same order as the RNA barcode library. Support gzipped file.")
+    group_input.add_argument("--rna-barcode-lib", dest = "rna_barcode_lib", default = "",
+        help = "Location of the scRNA-seq barcode library (for example, the Cell Ranger ARC GEX barcode whitelist). "
+        "Each line is one valid RNA barcode, in the same order as the ATAC barcode library. Support gzipped file.")
+    group_input.add_argument("--direction", dest = "direction", default = "atac-to-rna",
+        choices = ["atac-to-rna", "rna-to-atac"],
+        help = "Direction of barcode translation. If set as 'atac-to-rna', ATAC barcodes will be translated "
+        "to the paired RNA barcodes and the overlapped cells will be named by RNA barcodes, and vice versa. DEFAULT: atac-to-rna.")
+    group_input.add_argument("--species", dest = "species", default = "GRCh38",
+        choices = ["GRCh38", "GRCm38"], type = str,
+        help = "Species (GRCh38 for human and GRCm38 for mouse). DEFAULT: GRCh38.")
+
+    group_output = workflow.add_argument_group("Output arguments")
+    group_output.add_argument("-d", "--directory", dest = "directory", default = "MAESTRO",
+        help = "Path to the directory where the result file shall be stored. DEFAULT: MAESTRO.")
+    group_output.add_argument("--outprefix", dest = "outprefix", default = "MAESTRO",
+        help = "Prefix of output files. DEFAULT: MAESTRO.")
+
+
+def _read_lib(lib_file):
+    """Read a one-column barcode library file (plain or gzipped) into a numpy array.
+
+    Barcodes are kept as a fixed-width byte array (16 bytes per entry for 10x
+    whitelists), which packs tightly, compares without per-element Python
+    objects, and is cached as a binary .npy sidecar beside the source file so
+    later invocations can memory-map the cache instead of re-parsing the text.
+    """
+
+    import numpy as np
+    import pandas as pd
+
+    from MAESTRO.scATAC_utility import is_gzip
+
+    cache_file = lib_file + ".npy"
+    if os.path.exists(cache_file) and os.path.getmtime(cache_file) >= os.path.getmtime(lib_file):
+        lib = np.load(cache_file, mmap_mode = "r")
+        if lib.dtype.kind == "S":
+            return lib
+        # stale cache in an older (unicode) layout, rebuild it below
+
+    compression = "gzip" if is_gzip(lib_file) else None
+    lib = pd.read_csv(lib_file, header = None, names = ["barcode"], dtype = str,
+        engine = "c", compression = compression)["barcode"].to_numpy()
+    lib = lib.astype("S")
+    try:
+        np.save(cache_file, lib)
+    except OSError:
+        # library may sit in a read-only directory, then caching is skipped
+        pass
+    return lib
+
+
+def _lib_indexer(lib_arr, barcodes):
+    """Locate each barcode's row in the library with a sorted search; -1 marks missing."""
+
+    import numpy as np
+
+    order = np.argsort(lib_arr, kind = "stable")
+    lib_sorted = lib_arr[order]
+    pos = np.searchsorted(lib_sorted, barcodes)
+    # searchsorted returns len(lib) for barcodes beyond the last entry; clamp
+    # so the equality check below stays in bounds (those can never match)
+    pos[pos == len(lib_sorted)] = 0
+    return np.where(lib_sorted[pos] == barcodes, order[pos], -1)
+
+
+def barcodemap(directory, outprefix, rnacount, peakcount, atac_barcode_lib, rna_barcode_lib, direction, species):
+    """Map barcodes between the two libraries of 10x multiome data and filter both matrices to the overlapped cells."""
+
+    import h5py
+    import numpy as np
+    import pandas as pd
+
+    from MAESTRO.scATAC_H5Process import read_10X_h5, write_10X_h5, write_10X_h5_multiome
+
+    try:
+        os.makedirs(directory)
+    except OSError:
+        # either directory exists (then we can ignore) or it will fail in the
+        # next step.
+        pass
+
+    atac_barcode_lib_list = _read_lib(atac_barcode_lib)
+    rna_barcode_lib_list = _read_lib(rna_barcode_lib)
+
+    # only barcodes and features are loaded before the overlap is known; the
+    # matrices themselves are read column-wise afterwards
+    with h5py.File(rnacount, "r") as f:
+        rna_features = f["matrix"]["features"]["name"][:]
+        rna_barcodes = f["matrix"]["barcodes"][:]
+    if rna_features.dtype.kind == "S":
+        rna_features = np.char.decode(rna_features, "utf-8")
+    if rna_barcodes.dtype.kind == "U":
+        rna_barcodes = np.char.encode(rna_barcodes, "utf-8")
+
+    with h5py.File(peakcount, "r") as f:
+        atac_features = f["matrix"]["features"]["name"][:]
+        atac_barcodes = f["matrix"]["barcodes"][:]
+    if atac_features.dtype.kind == "S":
+        atac_features = np.char.decode(atac_features, "utf-8")
+    if atac_barcodes.dtype.kind == "U":
+        atac_barcodes = np.char.encode(atac_barcodes, "utf-8")
+    atac_features = pd.Series(atac_features).str.replace("\\W", "_", regex = True).to_numpy()
+
+    atac_lib_arr = np.asarray(atac_barcode_lib_list)
+    rna_lib_arr = np.asarray(rna_barcode_lib_list)
+    # the two libraries pair row-for-row, so a barcode's row index in its own
+    # library is a cell code shared by both assays (-1 marks barcodes missing
+    # from the library); lookups run as sorted searches over the byte arrays,
+    # and translation and intersection then stay in integer space without
+    # materializing any translated string array
+    atac_codes = _lib_indexer(atac_lib_arr, atac_barcodes)
+    rna_codes = _lib_indexer(rna_lib_arr, rna_barcodes)
+    atac_valid = np.where(atac_codes >= 0)[0]
+    rna_valid = np.where(rna_codes >= 0)[0]
+    # cell barcodes are unique within each matrix, so their library codes are
+    # too; assume_unique skips intersect1d's deduplication pass, and the
+    # overlap comes out sorted by code, giving byte-identical output across
+    # runs with no hash-order dependence
+    overlap_codes, atac_valid_idx, rna_valid_idx = np.intersect1d(
+        atac_codes[atac_valid], rna_codes[rna_valid], assume_unique = True, return_indices = True)
+    # cell counts fit comfortably in int32; the narrower index arrays halve
+    # the cache traffic of the column gathers below
+    atac_barcode_idx = atac_valid[atac_valid_idx].astype(np.int32, copy = False)
+    rna_barcode_idx = rna_valid[rna_valid_idx].astype(np.int32, copy = False)
+    if direction == "rna-to-atac":
+        barcode_overlapped = atac_lib_arr[overlap_codes].tolist()
+    else:
+        barcode_overlapped = rna_lib_arr[overlap_codes].tolist()
+
+    genematrix_filtered = read_10X_h5(rnacount, cols = rna_barcode_idx).matrix
+    peakmatrix_filtered = read_10X_h5(peakcount, cols = atac_barcode_idx).matrix
+
+    gene_file = os.path.join(directory, outprefix + "_multiome_gene_count.h5")
+    peak_file = os.path.join(directory, outprefix + "_multiome_peak_count.h5")
+    write_10X_h5(gene_file, matrix = genematrix_filtered, features = rna_features,
+        barcodes = barcode_overlapped, genome = species, datatype = "Gene")
+    write_10X_h5(peak_file, matrix = peakmatrix_filtered, features = atac_features,
+        barcodes = barcode_overlapped, genome = species, datatype = "Peak")
+
+    multiome_file = os.path.join(directory, outprefix + "_multiome_count.h5")
+    write_10X_h5_multiome(multiome_file, genematrix = genematrix_filtered, peakmatrix = peakmatrix_filtered,
+        gene_features = rna_features, peak_features = atac_features, barcodes = barcode_overlapped, genome = species)
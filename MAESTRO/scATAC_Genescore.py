@@ -421,9 +421,9 @@ def genescore(fileformat, directory, outprefix, peakcount, feature, barcode, gen
     elif fileformat == "h5":
         scatac_count = read_10X_h5(peakcount)
         peakmatrix = scatac_count.matrix
-        features = scatac_count.names.tolist()
-        features = [re.sub("\W", "_", feature.decode()) for feature in features]
-        features = [feature.encode() for feature in features]
+        features = np.char.decode(scatac_count.names, "utf-8")
+        features = pd.Series(features).str.replace("\\W", "_", regex = True)
+        features = np.char.encode(features.to_numpy().astype(str), "utf-8").tolist()
         barcodes = scatac_count.barcodes.tolist()
 
     elif fileformat == "mtx":
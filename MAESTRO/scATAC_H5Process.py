@@ -172,8 +172,13 @@ def mergeh5_parser(subparsers):
 FeatureBCMatrix = collections.namedtuple('FeatureBCMatrix', ['ids', 'names', 'barcodes', 'matrix'])
 
 
-def read_10X_h5(filename):
-    """Read 10X HDF5 files, support both gene expression and peaks."""
+def read_10X_h5(filename, cols = None):
+    """Read 10X HDF5 files, support both gene expression and peaks.
+
+    If cols is given, only the selected columns (cells) of the matrix are read
+    from disk and assembled directly in CSC form, so the full matrix is never
+    materialized and the barcodes are subset accordingly.
+    """
     with tables.open_file(filename, 'r') as f:
         try:
             group = f.get_node(f.root, 'matrix')
@@ -184,21 +189,114 @@ def read_10X_h5(filename):
         ids = getattr(feature_group, 'id').read()
         names = getattr(feature_group, 'name').read()
         barcodes = getattr(group, 'barcodes').read()
-        data = getattr(group, 'data').read()
-        indices = getattr(group, 'indices').read()
-        indptr = getattr(group, 'indptr').read()
         shape = getattr(group, 'shape').read()
-        matrix = sp_sparse.csc_matrix((data, indices, indptr), shape=shape)
+        data_node = getattr(group, 'data')
+        indices_node = getattr(group, 'indices')
+        indptr = getattr(group, 'indptr').read()
+        if cols is None:
+            matrix = sp_sparse.csc_matrix((data_node.read(), indices_node.read(), indptr), shape=shape)
+        else:
+            cols = numpy.asarray(cols, dtype = numpy.int32)
+            # read the columns in sorted order, so runs of consecutive columns
+            # collapse into single contiguous reads instead of per-column lookups
+            order = numpy.argsort(cols, kind = "stable")
+            cols_sorted = cols[order]
+            starts = indptr[cols_sorted]
+            ends = indptr[cols_sorted + 1]
+            sorted_indptr = numpy.zeros(len(cols) + 1, dtype = indptr.dtype)
+            numpy.cumsum(ends - starts, out = sorted_indptr[1:])
+            sorted_data = numpy.empty(sorted_indptr[-1], dtype = data_node.dtype)
+            sorted_indices = numpy.empty(sorted_indptr[-1], dtype = indices_node.dtype)
+            run_start = 0
+            for k in range(1, len(cols_sorted) + 1):
+                if k == len(cols_sorted) or cols_sorted[k] != cols_sorted[k - 1] + 1:
+                    span_start = starts[run_start]
+                    span_end = ends[k - 1]
+                    out = sorted_indptr[run_start]
+                    n = span_end - span_start
+                    sorted_data[out:out + n] = data_node[span_start:span_end]
+                    sorted_indices[out:out + n] = indices_node[span_start:span_end]
+                    run_start = k
+            if numpy.array_equal(cols_sorted, cols):
+                matrix = sp_sparse.csc_matrix((sorted_data, sorted_indices, sorted_indptr), shape=(shape[0], len(cols)))
+            else:
+                # restore the caller's column order with an in-memory permute
+                pos = numpy.empty_like(order)
+                pos[order] = numpy.arange(len(order), dtype = order.dtype)
+                caller_starts = sorted_indptr[pos]
+                caller_ends = sorted_indptr[pos + 1]
+                new_indptr = numpy.zeros(len(cols) + 1, dtype = indptr.dtype)
+                numpy.cumsum(caller_ends - caller_starts, out = new_indptr[1:])
+                new_data = numpy.empty(new_indptr[-1], dtype = sorted_data.dtype)
+                new_indices = numpy.empty(new_indptr[-1], dtype = sorted_indices.dtype)
+                _csc_gather(sorted_data, sorted_indices, caller_starts, caller_ends, new_indptr, new_data, new_indices)
+                matrix = sp_sparse.csc_matrix((new_data, new_indices, new_indptr), shape=(shape[0], len(cols)))
+            barcodes = barcodes[cols]
         return FeatureBCMatrix(ids, names, barcodes, matrix)
 
 
+try:
+    import numba
+
+    @numba.njit(parallel = True, cache = True)
+    def _csc_gather(data, indices, starts, ends, new_indptr, new_data, new_indices):
+        for k in numba.prange(len(starts)):
+            start = starts[k]
+            out = new_indptr[k]
+            for j in range(ends[k] - start):
+                new_data[out + j] = data[start + j]
+                new_indices[out + j] = indices[start + j]
+
+except ImportError:
+    # numba is optional, fall back to copying column spans with numpy slices
+    def _csc_gather(data, indices, starts, ends, new_indptr, new_data, new_indices):
+        for k in range(len(starts)):
+            start = starts[k]
+            end = ends[k]
+            out = new_indptr[k]
+            new_data[out:out + end - start] = data[start:end]
+            new_indices[out:out + end - start] = indices[start:end]
+
+
+def csc_take_cols(matrix, col_idx):
+    """Subset the columns of a CSC matrix by direct indptr arithmetic.
+
+    Equivalent to matrix[:, col_idx] but builds the output data/indices/indptr
+    arrays in place, without the intermediate copies of scipy fancy indexing.
+    The per-column gather is JIT-compiled and parallelized when numba is
+    available.
+    """
+
+    col_idx = numpy.asarray(col_idx, dtype = numpy.int32)
+    starts = matrix.indptr[col_idx]
+    ends = matrix.indptr[col_idx + 1]
+    new_indptr = numpy.zeros(len(col_idx) + 1, dtype = matrix.indptr.dtype)
+    numpy.cumsum(ends - starts, out = new_indptr[1:])
+    new_data = numpy.empty(new_indptr[-1], dtype = matrix.data.dtype)
+    new_indices = numpy.empty(new_indptr[-1], dtype = matrix.indices.dtype)
+    _csc_gather(matrix.data, matrix.indices, starts, ends, new_indptr, new_data, new_indices)
+    return sp_sparse.csc_matrix((new_data, new_indices, new_indptr), shape = (matrix.shape[0], len(col_idx)))
+
+
+def _ensure_csc(matrix, dtype):
+    """Return matrix as a CSC matrix of the given dtype, copying only when needed.
+
+    A matrix which is already CSC keeps its indptr/indices arrays and at most
+    casts its data, instead of going through a full format conversion.
+    """
+
+    if sp_sparse.issparse(matrix) and matrix.format == 'csc':
+        return matrix.astype(dtype, copy = False)
+    return sp_sparse.csc_matrix(matrix, dtype = dtype)
+
+
 def write_10X_h5(filename, matrix, features, barcodes, genome = 'GRCh38', datatype = 'Peak'):
     """Write 10X HDF5 files, support both gene expression and peaks."""
     f = h5py.File(filename, 'w')
     if datatype == 'Peak':
-       M = sp_sparse.csc_matrix(matrix, dtype=numpy.int8)
+       M = _ensure_csc(matrix, numpy.int8)
     else:
-       M = sp_sparse.csc_matrix(matrix, dtype=numpy.float32)
+       M = _ensure_csc(matrix, numpy.float32)
     B = numpy.array(barcodes, dtype='|S200')
     P = numpy.array(features, dtype='|S100')
     GM = numpy.array([genome]*len(features), dtype='|S10')
@@ -218,6 +316,38 @@ def write_10X_h5(filename, matrix, features, barcodes, genome = 'GRCh38', dataty
     fet.create_dataset('name', data=P)
     f.close()
 
+def write_10X_h5_multiome(filename, genematrix, peakmatrix, gene_features, peak_features, barcodes, genome = 'GRCh38'):
+    """Write a fused 10X HDF5 file holding both the gene and the peak matrix of multiome data.
+
+    The two matrices must share the same cells (columns). They are stacked
+    along the feature axis with scipy.sparse.vstack, which concatenates the
+    nonzeros in O(nnz) and keeps the result in CSC form.
+    """
+
+    M = sp_sparse.vstack([_ensure_csc(genematrix, numpy.float32),
+        _ensure_csc(peakmatrix, numpy.float32)], format='csc')
+    features = list(gene_features) + list(peak_features)
+    B = numpy.array(barcodes, dtype='|S200')
+    P = numpy.array(features, dtype='|S100')
+    GM = numpy.array([genome]*len(features), dtype='|S10')
+    FT = numpy.array(['Gene Expression']*len(gene_features) + ['Peaks']*len(peak_features), dtype='|S100')
+    AT = numpy.array(['genome'], dtype='|S10')
+    f = h5py.File(filename, 'w')
+    mat = f.create_group('matrix')
+    mat.create_dataset('barcodes', data=B)
+    mat.create_dataset('data', data=M.data)
+    mat.create_dataset('indices', data=M.indices)
+    mat.create_dataset('indptr', data=M.indptr)
+    mat.create_dataset('shape', data=M.shape)
+    fet = mat.create_group('features')
+    fet.create_dataset('_all_tag_keys', data=AT)
+    fet.create_dataset('feature_type', data=FT)
+    fet.create_dataset('genome', data=GM)
+    fet.create_dataset('id', data=P)
+    fet.create_dataset('name', data=P)
+    f.close()
+
+
 def merge_10X_h5(directory, outprefix, h5list, prefixlist, genome = 'GRCh38', datatype = 'Gene'):
     """Merge 10X HDF5 files, h5 filenames should be provided as list."""
 
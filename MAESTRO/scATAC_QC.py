@@ -73,7 +73,7 @@ def Filter(rawmatrix, feature, barcode, peak_cutoff, validcell, cell_cutoff, out
     if validcell == []:
         passed_cell = peaks_per_cell > peak_cutoff
     else:
-        valid_cell = np.asarray([i in validcell for i in barcode])
+        valid_cell = np.isin(np.asarray(barcode), np.asarray(validcell))
         passed_cell = np.logical_and(peaks_per_cell > peak_cutoff, valid_cell)
 
     cells_per_peak = np.asarray((rawmatrix > 0).sum(axis=1))
@@ -104,7 +104,7 @@ def scatac_qc(directory, outprefix, fileformat, peakcount, feature, barcode, sin
     if fileformat == "plain":
         matrix_dict = read_count(peakcount)
         peakmatrix = matrix_dict["matrix"]
-        peakmatrix = sp_sparse.csc_matrix(peakmatrix, dtype=numpy.int8)
+        peakmatrix = sp_sparse.csc_matrix(peakmatrix, dtype=np.int8)
         features = matrix_dict["features"]
         barcodes = matrix_dict["barcodes"]
 
@@ -111,7 +111,7 @@ def scrna_qc(directory, outprefix, fileformat, matrix, separator, feature, gene_
     if fileformat == "plain":
         matrix_dict = read_count(matrix, separator)
         rawmatrix = matrix_dict["matrix"]
-        rawmatrix = sp_sparse.csc_matrix(rawmatrix, dtype=numpy.float32)
+        rawmatrix = sp_sparse.csc_matrix(rawmatrix, dtype=np.float32)
         features = matrix_dict["features"]
         barcodes = matrix_dict["barcodes"]
 